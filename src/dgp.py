@@ -1,9 +1,22 @@
+import numpy as np
 import pgmpy
+from numba import njit
 from pgmpy.base import DAG
 from pgmpy.factors.discrete import TabularCPD
 from pgmpy.models import BayesianNetwork
 
 
+# Deterministic observation tables, indexed as [E, twin value, original value]. The baseline
+# covariate C is always observed correctly, while A and Y are replaced by their twin draw
+# whenever an error occurs.
+_C_OBS_TABLE = np.array([[[0, 1], [0, 1]], [[0, 1], [0, 1]]], dtype=np.int8)
+_A_OBS_TABLE = np.array([[[0, 1], [0, 1]], [[0, 0], [1, 1]]], dtype=np.int8)
+_Y_OBS_TABLE = np.array([[[0, 1], [0, 1]], [[0, 0], [1, 1]]], dtype=np.int8)
+
+# Row order of the buffer filled by _sample_twin
+TWIN_ERROR_VARIABLES = ("C", "A", "Y", "C1", "A1", "Y1", "E", "C_obs", "A_obs", "Y_obs")
+
+
 def create_twin_error_graph() -> list:
     """
     Creates the twin-error graph model for a conditionally ignorable model with errors.
@@ -120,6 +133,23 @@ def create_statins_stroke_cpds(confounding_strength, pC=0.5, po_Y_1=0.024, po_Y_
     return cpds
 
 
+def _deterministic_cpd(variable: str, table: np.ndarray, evidence: list) -> TabularCPD:
+    """
+    Converts one of the observation tables into a deterministic TabularCPD, with the evidence
+    ordered as the table's axes.
+
+    """
+    flat = table.reshape(-1)
+
+    return TabularCPD(
+        variable=variable,
+        variable_card=2,
+        values=np.stack([1 - flat, flat]),
+        evidence=evidence,
+        evidence_card=[2, 2, 2],
+    )
+
+
 def create_twin_error_model(graph: list, cpds: dict, error_rate: float):
     """
     Creates the twin-error model over binary variables. Only CPDs relevant to the conditionally ignorable model need to be
@@ -160,28 +190,9 @@ def create_twin_error_model(graph: list, cpds: dict, error_rate: float):
         variable="E", variable_card=2, values=[[1 - error_rate], [error_rate]]
     )
 
-    cpd_c_obs = TabularCPD(
-        variable="C_obs",
-        variable_card=2,
-        values=[[1, 0, 1, 0, 1, 0, 1, 0], [0, 1, 0, 1, 0, 1, 0, 1]],
-        evidence=["E", "C1", "C"],
-        evidence_card=[2, 2, 2],
-    )
-    cpd_y_obs = TabularCPD(
-        variable="Y_obs",
-        variable_card=2,
-        values=[[1, 0, 1, 0, 1, 1, 0, 0], [0, 1, 0, 1, 0, 0, 1, 1]],
-        evidence=["E", "Y1", "Y"],
-        evidence_card=[2, 2, 2],
-    )
-
-    cpd_a_obs = TabularCPD(
-        variable="A_obs",
-        variable_card=2,
-        values=[[1, 0, 1, 0, 1, 1, 0, 0], [0, 1, 0, 1, 0, 0, 1, 1]],
-        evidence=["E", "A1", "A"],
-        evidence_card=[2, 2, 2],
-    )
+    cpd_c_obs = _deterministic_cpd("C_obs", _C_OBS_TABLE, ["E", "C1", "C"])
+    cpd_y_obs = _deterministic_cpd("Y_obs", _Y_OBS_TABLE, ["E", "Y1", "Y"])
+    cpd_a_obs = _deterministic_cpd("A_obs", _A_OBS_TABLE, ["E", "A1", "A"])
 
     all_cpds = cpds | {
         "C1": cpd_c1,
@@ -200,4 +211,125 @@ def create_twin_error_model(graph: list, cpds: dict, error_rate: float):
     return model
 
 
+@njit(cache=True)
+def _sample_twin(pC, pA0, pA1, pY00, pY01, pY10, pY11, error_rate, u, out):
+    """
+    Fills out (of shape (10, n), rows ordered as TWIN_ERROR_VARIABLES) with draws from the
+    twin-error model, by thresholding the uniform draws u (of shape (7, n)).
+
+    pA* is p(A = 1 | C = *) and pY** is p(Y = 1 | A = *, C = *).
+
+    """
+    for i in range(u.shape[1]):
+        c = np.int8(u[0, i] < pC)
+        a = np.int8(u[1, i] < (pA1 if c else pA0))
+        if a:
+            y = np.int8(u[2, i] < (pY11 if c else pY10))
+        else:
+            y = np.int8(u[2, i] < (pY01 if c else pY00))
+
+        c1 = np.int8(u[3, i] < pC)
+        a1 = np.int8(u[4, i] < (pA1 if c1 else pA0))
+        if a1:
+            y1 = np.int8(u[5, i] < (pY11 if c1 else pY10))
+        else:
+            y1 = np.int8(u[5, i] < (pY01 if c1 else pY00))
+
+        e = np.int8(u[6, i] < error_rate)
+
+        out[0, i] = c
+        out[1, i] = a
+        out[2, i] = y
+        out[3, i] = c1
+        out[4, i] = a1
+        out[5, i] = y1
+        out[6, i] = e
+        out[7, i] = _C_OBS_TABLE[e, c1, c]
+        out[8, i] = _A_OBS_TABLE[e, a1, a]
+        out[9, i] = _Y_OBS_TABLE[e, y1, y]
+
+
+# Compile (or load from the cache) at import, so that the first bootstrap does not pay for it
+_sample_twin(0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, np.zeros((7, 1)), np.empty((10, 1), np.int8))
+
+
+def simulate_twin_error(
+    cpds: dict, error_rate: float, n: int, rng: np.random.Generator, out: np.ndarray = None
+):
+    """
+    Draws samples from the twin-error model with a compiled sampler. This is equivalent to
+    calling simulate() on the model returned by create_twin_error_model, but avoids the overhead
+    of pgmpy's generic forward sampler.
+
+    Parameters
+    ----------
+    cpds : dict
+        CPDs for C, A and Y, as returned by create_statins_stroke_cpds
+
+    error_rate : float
+        The rate of match sampling errors
+
+    n : int
+        Number of samples to draw
+
+    rng : np.random.Generator
+
+    out : np.ndarray, optional
+        int8 buffer of shape (10, n) to sample into, so that it can be reused across bootstraps.
+        The returned arrays are views into this buffer.
+
+    Returns
+    -------
+    dict
+        One int8 array per variable in the twin-error graph
+
+    """
+    # p(C = 1), p(A = 1 | C) indexed by C, and p(Y = 1 | A, C) indexed by 2 * A + C
+    pC = cpds["C"].get_values()[1, 0]
+    pA = cpds["A"].get_values()[1]
+    pY = cpds["Y"].get_values()[1]
+
+    if out is None:
+        out = np.empty((len(TWIN_ERROR_VARIABLES), n), dtype=np.int8)
+    elif out.shape != (len(TWIN_ERROR_VARIABLES), n) or out.dtype != np.int8:
+        raise ValueError(
+            f"out must be an int8 array of shape {(len(TWIN_ERROR_VARIABLES), n)}, "
+            f"got {out.dtype} array of shape {out.shape}"
+        )
+
+    _sample_twin(pC, *pA, *pY, error_rate, rng.random((7, n)), out)
+
+    return dict(zip(TWIN_ERROR_VARIABLES, out))
+
+
+def simulate_twin_error_batch(
+    cpds: dict, error_rate: float, n: int, bootstraps: int, rng: np.random.Generator
+):
+    """
+    Draws all bootstrap samples from the twin-error model in a single call.
+
+    Parameters
+    ----------
+    cpds : dict
+        CPDs for C, A and Y, as returned by create_statins_stroke_cpds
+
+    error_rate : float
+        The rate of match sampling errors
+
+    n : int
+        Number of samples to draw per bootstrap
+
+    bootstraps : int
+        Number of bootstrap samples
+
+    rng : np.random.Generator
+
+    Returns
+    -------
+    dict
+        One int8 array of shape (bootstraps, n) per variable in the twin-error graph
+
+    """
+    samples = simulate_twin_error(cpds, error_rate, bootstraps * n, rng)
 
+    return {k: v.reshape(bootstraps, n) for k, v in samples.items()}
@@ -1,16 +1,120 @@
 import numpy as np
+import pandas as pd
 from statsmodels.discrete.discrete_model import Logit
 from statsmodels.treatment.treatment_effects import TreatmentEffect
 
 
-def ipw(df, treatment, outcome, confounders):
+def _is_discrete(column):
+    """
+    Whether a confounder column is discrete, judged by its dtype: bool, integer, string/object
+    and pandas categorical columns are.
 
-    treatment_model = Logit.from_formula(f'{treatment} ~ {"+".join(confounders)}', df).fit()
-    propensity_score = treatment_model.predict()
-    weight = np.where(df[treatment] == 1, 1 / propensity_score, 1 / (1 - propensity_score))
+    """
+    return isinstance(column.dtype, pd.CategoricalDtype) or column.dtype.kind in "biuOSU"
 
-    y1 = np.sum(df.loc[df[treatment] == 1, outcome] * weight[df[treatment] == 1]) / df.shape[0]
-    y0 = np.sum(df.loc[df[treatment] == 0, outcome] * weight[df[treatment] == 0]) / df.shape[0]
+
+def _design_matrix(columns):
+    """
+    Builds the main-effects logit design matrix: an intercept, numeric confounders as they are,
+    and treatment-coded dummies (dropping the first level) for string and categorical ones.
+
+    """
+    blocks = [np.ones((len(columns[0]), 1))]
+    for c in columns:
+        if isinstance(c.dtype, pd.CategoricalDtype) or c.dtype.kind in "OSU":
+            blocks.append(pd.get_dummies(np.asarray(c), drop_first=True, dtype=float).to_numpy())
+        else:
+            blocks.append(np.asarray(c, dtype=np.float64).reshape(-1, 1))
+
+    return np.hstack(blocks)
+
+
+def _stratum_codes(columns):
+    """
+    Assigns each row an integer code for its stratum, i.e. its combination of confounder levels.
+
+    """
+    codes = [np.unique(np.asarray(c), return_inverse=True)[1].ravel() for c in columns]
+    if len(codes) == 1:
+        return codes[0]
+
+    return np.unique(np.column_stack(codes), axis=0, return_inverse=True)[1].ravel()
+
+
+def _stratum_propensity(treated, codes):
+    """
+    Computes p(A = 1 | strata) as the proportion of treated units in each stratum, evaluated at
+    each row. Returned in float32, which is ample precision for a stratum proportion.
+
+    """
+    p1 = (np.bincount(codes, weights=treated) / np.bincount(codes)).astype(np.float32)
+
+    return p1[codes]
+
+
+def ipw(df, treatment, outcome, confounders, method="closed_form"):
+    """
+    Estimates the mean potential outcomes E[Y(0)] and E[Y(1)] by inverse propensity weighting.
+
+    Parameters
+    ----------
+    df : pd.DataFrame or dict
+        Either a DataFrame or a dict of 1-d arrays, such as the output of
+        dgp.simulate_twin_error
+
+    treatment : str
+
+    outcome : str
+
+    confounders : str or list
+
+    method : str
+        How to estimate the propensity score. "closed_form" uses the empirical proportion of
+        treated units within each confounder stratum, which is the MLE of the saturated model.
+        It only applies when every confounder has a discrete dtype (bool, integer, string/object
+        or categorical); otherwise "logit" is used instead. "logit" fits a main-effects logistic
+        regression with statsmodels. Under "closed_form", the propensity
+        scores and weights are computed in float32, and only the final sums are accumulated in
+        float64.
+
+    """
+    if isinstance(confounders, str):
+        confounders = [confounders]
+
+    A = np.asarray(df[treatment])
+    Y = np.asarray(df[outcome])
+
+    columns = [df[c] for c in confounders]
+
+    # A bool treatment column is already a mask. Other dtypes are compared against 1, since
+    # reinterpreting e.g. an int8 column coded 1/2 would mark every unit as treated.
+    if A.dtype == np.bool_:
+        treated = A
+    else:
+        treated = A == 1
+
+    if method == "closed_form" and not all(_is_discrete(c) for c in columns):
+        method = "logit"
+
+    if method == "logit":
+        # Build the design matrix directly rather than re-parsing a formula on every call
+        X = _design_matrix(columns)
+        treatment_model = Logit(A.astype(np.float64), X).fit(disp=0, method="newton")
+        propensity_score = treatment_model.predict()
+    elif method == "closed_form":
+        propensity_score = _stratum_propensity(treated, _stratum_codes(columns))
+    else:
+        raise ValueError(f"Unknown propensity score method: {method}")
+
+    # Only evaluate the weight each unit actually uses, so that strata with all units treated
+    # (or untreated) don't divide by zero in the unused branch
+    weight = np.empty_like(propensity_score)
+    weight[treated] = 1 / propensity_score[treated]
+    weight[~treated] = 1 / (1 - propensity_score[~treated])
+    weighted_outcome = Y * weight
+
+    y1 = weighted_outcome[treated].sum(dtype=np.float64) / A.size
+    y0 = weighted_outcome[~treated].sum(dtype=np.float64) / A.size
 
     return y0, y1
 
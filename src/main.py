@@ -1,8 +1,69 @@
 import estimators
-import itertools
 import pandas as pd
 import dgp
+import numpy as np
 import os
+from joblib import Parallel, delayed
+
+
+# One row per bootstrap replicate, in the column order of the output csv
+RESULT_DTYPE = np.dtype(
+    [
+        ("bootstraps", "i4"),
+        ("sample_size", "i4"),
+        ("error_rate", "f8"),
+        ("recall_rate", "f8"),
+        ("est_odds_ratio", "f8"),
+        ("est_y0", "f8"),
+        ("est_y1", "f8"),
+    ]
+)
+
+
+def run_param(cpds, param, fixed_params, n_samples, rng, out):
+    """
+    Runs all bootstrap replicates for a single grid point: simulates from the twin-error model
+    and estimates the odds ratio by IPW. All replicates are simulated in a single batch, and the
+    results are written into out, a RESULT_DTYPE array with one row per bootstrap.
+
+    """
+    samples = dgp.simulate_twin_error_batch(
+        cpds, param["error_rate"], n_samples, fixed_params["bootstraps"], rng
+    )
+
+    for i in range(fixed_params["bootstraps"]):
+
+        out["est_y0"][i], out["est_y1"][i] = estimators.ipw(
+            {k: samples[k][i] for k in ("A", "Y", "C")}, treatment="A", outcome="Y", confounders="C"
+        )
+
+    out["est_odds_ratio"] = estimators.compute_or(out["est_y0"], out["est_y1"])
+
+    for k, v in (fixed_params | param).items():
+        out[k] = v
+
+
+def run_error_rate(cpds, error_rate, recall_rates, fixed_params, seed_sequence):
+    """
+    Runs every recall rate for a single error rate. The recall rate only changes the sample size,
+    so all of them share the same compiled sampler.
+
+    """
+    rng = np.random.Generator(np.random.SFC64(seed_sequence))
+
+    bootstraps = fixed_params["bootstraps"]
+    results = np.empty(len(recall_rates) * bootstraps, dtype=RESULT_DTYPE)
+    for j, recall_rate in enumerate(recall_rates):
+
+        param = dict(error_rate=error_rate, recall_rate=recall_rate)
+        n_samples = int(recall_rate * fixed_params["sample_size"])
+
+        run_param(
+            cpds, param, fixed_params, n_samples, rng, results[j * bootstraps : (j + 1) * bootstraps]
+        )
+
+    return results
+
 
 if __name__ == "__main__":
     output_dir = "../output/"
@@ -19,36 +80,29 @@ if __name__ == "__main__":
 
     fixed_params = dict(bootstraps=5, sample_size=100)
 
-    graph = dgp.create_twin_error_graph()
-    cpds = dgp.create_statins_stroke_cpds(**dgp_params)
+    seed = 0
 
-    true_or = estimators.compute_or(dgp_params["po_Y_0"], dgp_params["po_Y_1"])
+    n_jobs = max(os.cpu_count() - 1, 1)
 
-    all_params = list(
-        dict(zip(list(variable_params), e))
-        for e in itertools.product(*list(variable_params.values()))
-    )
-
-    results = []
-    for param in all_params:
-
-        model = dgp.create_twin_error_model(graph, cpds, error_rate=param["error_rate"])
-
-        for i in range(fixed_params["bootstraps"]):
+    cpds = dgp.create_statins_stroke_cpds(**dgp_params)
 
-            df = model.simulate(
-                n_samples=int(param["recall_rate"] * fixed_params["sample_size"])
-            )
+    true_or = estimators.compute_or(dgp_params["po_Y_0"], dgp_params["po_Y_1"])
 
-            y0, y1 = estimators.ipw(df, treatment="A", outcome="Y", confounders="C")
+    # Each error rate is independent, so they are dispatched in parallel, each with its own
+    # random stream spawned from the root seed
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(variable_params["error_rate"]))
 
-            odds_ratio = estimators.compute_or(y0, y1)
+    blocks = Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(run_error_rate)(
+            cpds, error_rate, variable_params["recall_rate"], fixed_params, seed_sequence
+        )
+        for error_rate, seed_sequence in zip(variable_params["error_rate"], seed_sequences)
+    )
 
-            results.append(
-                fixed_params
-                | param
-                | {"est_odds_ratio": odds_ratio, "est_y0": y0, "est_y1": y1}
-            )
+    block_size = len(variable_params["recall_rate"]) * fixed_params["bootstraps"]
+    results = np.empty(len(blocks) * block_size, dtype=RESULT_DTYPE)
+    for j, block in enumerate(blocks):
+        results[j * block_size : (j + 1) * block_size] = block
 
     final_results = pd.DataFrame(results)
 
@@ -1,7 +1,9 @@
+import numpy as np
+import pandas as pd
 import pytest
 from pgmpy.inference import VariableElimination
 from pgmpy.models import BayesianNetwork
-from numpy.testing import assert_almost_equal
+from numpy.testing import assert_allclose, assert_almost_equal
 
 import dgp
 
@@ -13,10 +15,42 @@ def test_model():
 
     df = model.simulate(n_samples=1000)
 
+def _marginal(model, variables):
+    """
+    Computes the marginal over variables by contracting every CPD of model with np.einsum.
+    """
+    index = {v: i for i, v in enumerate(model.nodes())}
+
+    operands = []
+    for cpd in model.get_cpds():
+        operands += [cpd.get_values().reshape(cpd.cardinality), [index[v] for v in cpd.variables]]
+
+    return np.einsum(*operands, [index[v] for v in variables])
+
+
 def test_model_distribution_equals_original_under_no_error():
     graph = dgp.create_twin_error_graph()
     cpds = dgp.create_statins_stroke_cpds(confounding_strength=.2)
 
+    model = dgp.create_twin_error_model(graph, cpds, error_rate=0)
+
+    dist = _marginal(model, ['A_obs', 'C_obs', 'Y_obs'])
+
+    # Under no error, the observed variables are the original ones, so p(A, C, Y) is given
+    # directly by p(C) p(A | C) p(Y | A, C)
+    pC = cpds['C'].get_values().ravel()
+    pA = cpds['A'].get_values()
+    pY = cpds['Y'].get_values().reshape(2, 2, 2)
+    original_dist = np.einsum('c,ac,yac->acy', pC, pA, pY)
+
+    assert_almost_equal(dist, original_dist)
+
+
+@pytest.mark.slow
+def test_model_distribution_equals_original_under_no_error_variable_elimination():
+    graph = dgp.create_twin_error_graph()
+    cpds = dgp.create_statins_stroke_cpds(confounding_strength=.2)
+
     original_model = BayesianNetwork()
     original_model.add_edges_from([('C', 'A'), ('A', 'Y'), ('C', 'Y')])
     original_model.add_cpds(*list(cpds.values()))
@@ -27,9 +61,51 @@ def test_model_distribution_equals_original_under_no_error():
 
     inference = VariableElimination(model)
     dist = inference.query(['A_obs', 'C_obs', 'Y_obs'])
-    original_inference = VariableElimination(model)
+    original_inference = VariableElimination(original_model)
     original_dist = original_inference.query(['A', 'C', 'Y'])
 
     assert_almost_equal(dist.values, original_dist.values)
 
 
+def test_simulate_twin_error_matches_model_distribution():
+    graph = dgp.create_twin_error_graph()
+    cpds = dgp.create_statins_stroke_cpds(confounding_strength=.2)
+    model = dgp.create_twin_error_model(graph, cpds, error_rate=.05)
+
+    samples = dgp.simulate_twin_error(cpds, error_rate=.05, n=1000000, rng=np.random.default_rng(0))
+    df = pd.DataFrame(samples)
+
+    dist = VariableElimination(model).query(['A_obs', 'C_obs', 'Y_obs'])
+    empirical = df.groupby(['A_obs', 'C_obs', 'Y_obs']).size().to_numpy() / df.shape[0]
+
+    # The Y = 1 cells have probability below 0.02, so compare on a relative scale. With 1M draws
+    # the smallest cell (about 0.002) has a relative standard error of about 2%.
+    assert_allclose(empirical, dist.values.flatten(), rtol=0.15)
+
+
+def test_simulate_twin_error_batch_matches_model_distribution():
+    graph = dgp.create_twin_error_graph()
+    cpds = dgp.create_statins_stroke_cpds(confounding_strength=.2)
+    model = dgp.create_twin_error_model(graph, cpds, error_rate=.05)
+
+    samples = dgp.simulate_twin_error_batch(cpds, .05, n=1000000, bootstraps=3, rng=np.random.default_rng(0))
+
+    assert set(samples) == set(dgp.TWIN_ERROR_VARIABLES)
+    assert all(v.shape == (3, 1000000) for v in samples.values())
+
+    # Every bootstrap row is a separate draw, with the observed joint of the model
+    dist = VariableElimination(model).query(['A_obs', 'C_obs', 'Y_obs']).values.flatten()
+    for b in range(3):
+        df = pd.DataFrame({k: samples[k][b] for k in ['A_obs', 'C_obs', 'Y_obs']})
+        empirical = df.groupby(['A_obs', 'C_obs', 'Y_obs']).size().to_numpy() / df.shape[0]
+
+        assert_allclose(empirical, dist, rtol=0.15)
+
+    assert not np.array_equal(samples['Y_obs'][0], samples['Y_obs'][1])
+
+
+def test_simulate_twin_error_rejects_mismatched_buffer():
+    cpds = dgp.create_statins_stroke_cpds(confounding_strength=.2)
+
+    with pytest.raises(ValueError):
+        dgp.simulate_twin_error(cpds, .05, 5, np.random.default_rng(0), out=np.zeros((10, 50), np.int8))
@@ -13,3 +13,58 @@ def test_ipw():
     assert pytest.approx(0.75) == y1
 
 
+def test_ipw_closed_form_equals_logit():
+
+    df = pd.DataFrame({"A": [0, 0, 0, 1, 1, 1], "C": [0, 1, 1, 0, 0, 1], "Y": [1, 0, 0, 0, 1, 1]})
+    y0, y1 = estimators.ipw(df, "A", "Y", "C", method="logit")
+    assert pytest.approx((y0, y1)) == estimators.ipw(df, "A", "Y", "C", method="closed_form")
+
+
+def test_ipw_accepts_dict_of_arrays():
+
+    data = {"A": np.array([0, 0, 0, 1, 1, 1], dtype=np.int8),
+            "C": np.array([0, 1, 1, 0, 0, 1], dtype=np.int8),
+            "Y": np.array([1, 0, 0, 0, 1, 1], dtype=np.int8)}
+    y0, y1 = estimators.ipw(data, "A", "Y", "C")
+    assert pytest.approx(0.5) == y0
+    assert pytest.approx(0.75) == y1
+
+
+def test_ipw_closed_form_falls_back_to_logit_for_continuous_confounders():
+
+    rng = np.random.default_rng(0)
+    C = rng.normal(size=200)
+    A = (rng.random(200) < 1 / (1 + np.exp(-C))).astype(int)
+    Y = (rng.random(200) < 0.3 + 0.2 * A).astype(int)
+    df = pd.DataFrame({"A": A, "C": C, "Y": Y})
+
+    y0, y1 = estimators.ipw(df, "A", "Y", "C", method="logit")
+    assert pytest.approx((y0, y1)) == estimators.ipw(df, "A", "Y", "C", method="closed_form")
+
+
+@pytest.mark.parametrize("C", [list("mffmmf"), pd.Categorical(list("mffmmf"))])
+def test_ipw_closed_form_with_categorical_confounder(C):
+
+    df = pd.DataFrame({"A": [0, 0, 0, 1, 1, 1], "C": C, "Y": [1, 0, 0, 0, 1, 1]})
+    y0, y1 = estimators.ipw(df, "A", "Y", "C")
+    assert pytest.approx(0.5) == y0
+    assert pytest.approx(0.75) == y1
+
+
+@pytest.mark.parametrize("C", [list("mffmmf"), pd.Categorical(list("mffmmf"))])
+def test_ipw_logit_with_categorical_confounder(C):
+
+    df = pd.DataFrame({"A": [0, 0, 0, 1, 1, 1], "C": C, "Y": [1, 0, 0, 0, 1, 1]})
+    y0, y1 = estimators.ipw(df, "A", "Y", "C", method="logit")
+    assert pytest.approx(0.5) == y0
+    assert pytest.approx(0.75) == y1
+
+
+def test_ipw_int8_treatment_not_coded_01():
+
+    data = {"A": np.array([2, 2, 2, 1, 1, 1], dtype=np.int8),
+            "C": np.array([0, 1, 1, 0, 0, 1], dtype=np.int8),
+            "Y": np.array([1, 0, 0, 0, 1, 1], dtype=np.int8)}
+    y0, y1 = estimators.ipw(data, "A", "Y", "C")
+    assert pytest.approx(0.5) == y0
+    assert pytest.approx(0.75) == y1